@@ -1,10 +1,11 @@
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
-from scipy.stats import chisquare
-import random
+from matplotlib.figure import Figure
+from scipy.special import gammaincc
+import os
+import time
 import requests
-import io
+import urllib3
 
 """
 Updated powerball_auto_analysis.py
@@ -12,31 +13,152 @@ Updated powerball_auto_analysis.py
 Features:
 - Robust detection of winning-numbers column (handles several common schemas).
 - Supports datasets that already have white1..white5 + powerball columns.
-- Builds observed and expected arrays so scipy.stats.chisquare won't error.
-- analyze() returns a results dict and a matplotlib Figure (so Streamlit or other frontends can display them).
+- Builds observed and expected arrays with matching sums for the chi-square goodness-of-fit tests.
+- analyze() returns a results dict; build_figure() turns it into a matplotlib Figure when a frontend wants one.
 - Clear error messages and safe fallbacks.
 """
 
-def fetch_powerball_data(ny_fallback=True):
+# Local copy of the last successful fetch and how long (seconds) it stays fresh
+CACHE_PATH = "powerball_cache.parquet"
+CACHE_TTL = 3600
+
+def fetch_powerball_data(ny_fallback=True, cache_path=CACHE_PATH):
     """
     Fetch Powerball historical data.
     Primary source: New York open data CSV.
+    A fetched copy is kept in cache_path and reused while younger than CACHE_TTL
+    (cache_path=None skips it, for callers that cache the result themselves).
     If that fails and ny_fallback=True, raises the original exception for inspection.
     Returns a pandas.DataFrame (raw).
     """
+    # Serve from the on-disk cache when it is fresh enough
+    if cache_path is not None:
+        try:
+            if time.time() - os.path.getmtime(cache_path) < CACHE_TTL:
+                return pd.read_parquet(cache_path)
+        except Exception:
+            pass
+
     urls_tried = []
     # Primary: NY Open Data (commonly available)
     url_ny = "https://data.ny.gov/api/views/d6yy-54nr/rows.csv?accessType=DOWNLOAD"
     urls_tried.append(url_ny)
     try:
-        resp = requests.get(url_ny, timeout=20)
-        resp.raise_for_status()
-        df = pd.read_csv(io.StringIO(resp.text))
-        return df
-    except Exception as e:
-        # surface a helpful error with attempted URLs
+        # hand the raw response to read_csv instead of materializing resp.text first;
+        # timeout bounds both the connect and each read, so a stalled server can't hang the caller
+        with requests.get(url_ny, stream=True, timeout=20, headers={'User-Agent': 'powerball-webapp'}) as resp:
+            resp.raise_for_status()
+            resp.raw.decode_content = True
+            df = pd.read_csv(resp.raw)
+    except (requests.RequestException, urllib3.exceptions.HTTPError) as e:
+        # surface a helpful error with attempted URLs (errors raised while read_csv pulls
+        # the body, e.g. read timeouts or truncated transfers, come from urllib3)
         raise RuntimeError(f"Failed to fetch NY dataset from {url_ny}. Error: {e}")
 
+    # Caching is best-effort (needs pyarrow and a writable working directory)
+    if cache_path is not None:
+        try:
+            df.to_parquet(cache_path)
+        except Exception:
+            pass
+    return df
+
+# Standardized ball columns, also the column order of the compact (n_draws, 6) uint8 draws array
+DRAW_COLUMNS = ['white1','white2','white3','white4','white5','powerball']
+
+# Six integers separated by spaces, commas or dashes, e.g. "04 08 32 40 48 20" or "04,08,32,40,48-20"
+# ([0-9], not \d: \d also matches non-ASCII digits, which to_numeric and the numba tokenizer reject)
+WINNING_NUMBERS_PATTERN = r'^\s*([0-9]+)[\s,-]+([0-9]+)[\s,-]+([0-9]+)[\s,-]+([0-9]+)[\s,-]+([0-9]+)[\s,-]+([0-9]+)'
+
+# Above this many rows the numba tokenizer (when installed) replaces the regex extract
+NUMBA_MIN_ROWS = 10_000
+# Characters of each value the tokenizer looks at; a valid row fits easily, and the
+# fixed-width byte matrix would otherwise be as wide as the longest cell in the column
+NUMBA_MAX_CHARS = 64
+
+def _parse_rows(chars, out):
+    """
+    Tokenize fixed-width ASCII rows (one string per row of `chars`) into the (n, 6) `out` buffer,
+    following WINNING_NUMBERS_PATTERN. Returns a boolean mask of the rows that matched.
+    """
+    n, width = chars.shape
+    ok = np.zeros(n, dtype=np.bool_)
+    for i in range(n):
+        j = 0
+        val = 0
+        in_num = False
+        for k in range(width):
+            c = chars[i, k]
+            if 48 <= c <= 57:  # digit
+                val = val * 10 + (c - 48)
+                in_num = True
+                continue
+            if in_num:
+                out[i, j] = val
+                j += 1
+                val = 0
+                in_num = False
+                if j == 6:
+                    break
+            # whitespace may lead the string; commas and dashes only separate numbers
+            if c == 32 or (9 <= c <= 13) or (j > 0 and (c == 44 or c == 45)):
+                continue
+            break
+        if in_num and j < 6:
+            out[i, j] = val
+            j += 1
+        ok[i] = j == 6
+    return ok
+
+_compiled_parse_rows = None
+
+def _numba_parse_rows():
+    """
+    _parse_rows compiled with numba, or None when numba isn't installed.
+    numba is optional and slow to import, so it is only imported (and the
+    function compiled) the first time a large dataset needs it.
+    """
+    global _compiled_parse_rows
+    if _compiled_parse_rows is None:
+        try:
+            import numba
+        except ImportError:
+            _compiled_parse_rows = False
+        else:
+            _compiled_parse_rows = numba.njit(cache=True)(_parse_rows)
+    return _compiled_parse_rows or None
+
+def _extract_winning_numbers(series):
+    """
+    Split a column of winning-number strings into a 6-column DataFrame
+    (all-NaN rows where a value doesn't look like 6 numbers).
+    """
+    parse_rows = _numba_parse_rows() if len(series) > NUMBA_MIN_ROWS else None
+    if parse_rows is not None:
+        raw = series.astype(str).str.slice(0, NUMBA_MAX_CHARS).str.encode('ascii', errors='replace').to_numpy(dtype='S')
+        chars = raw.view(np.uint8).reshape(len(raw), raw.dtype.itemsize)
+        out = np.zeros((len(raw), 6), dtype=np.int64)
+        ok = parse_rows(chars, out)
+        parts = pd.DataFrame(out, index=series.index)
+        if not ok.all():
+            parts = parts.where(np.broadcast_to(ok[:, None], out.shape))
+        return parts
+    return series.astype(str).str.extract(WINNING_NUMBERS_PATTERN)
+
+def _narrow_balls(values):
+    """
+    Cast ball numbers to uint8 when that is lossless (the normal 1..69 case).
+    Anything outside 0..255 keeps a wide int64 so analyze() ignores it instead of
+    wrapping it into a valid ball.
+    """
+    if values.dtype == np.uint8:
+        return values
+    values = values.astype(np.int64)
+    arr = np.asarray(values)
+    if arr.size == 0 or (arr.min() >= 0 and arr.max() <= 255):
+        return values.astype(np.uint8)
+    return values
+
 def _detect_and_split_winning_numbers(df):
     """
     Detect how the dataset encodes the winning numbers and return a DataFrame
@@ -47,10 +169,11 @@ def _detect_and_split_winning_numbers(df):
       2) Separate columns already present: white1, white2, white3, white4, white5, powerball
       3) Some datasets have 'winning numbers' with commas, e.g. '04,08,32,40,48 20'
     """
-    df_copy = df.copy()
+    # no up-front deep copy: detection only reads df, and each branch below
+    # takes a shallow copy before it adds or replaces columns
     # normalize columns for detection
-    cols_lower = [c.lower() for c in df_copy.columns]
-    col_map = {c.lower(): c for c in df_copy.columns}
+    cols_lower = [c.lower() for c in df.columns]
+    col_map = {c.lower(): c for c in df.columns}
 
     # Case A: already have white1..white5 and powerball (common cleaned formats)
     required = ["white1","white2","white3","white4","white5","powerball"]
@@ -58,9 +181,10 @@ def _detect_and_split_winning_numbers(df):
         # map back to original-case column names
         mapped = {name: col_map[name] for name in col_map if name in required}
         # return with standardized lowercase column names
-        df_copy = df_copy.rename(columns={mapped[name]: name for name in mapped})
+        df_copy = df.copy(deep=False)
+        df_copy.rename(columns={mapped[name]: name for name in mapped}, inplace=True)
         for name in required:
-            df_copy[name] = df_copy[name].astype(int)
+            df_copy[name] = _narrow_balls(df_copy[name])
         return df_copy
 
     # Case B: single column containing all numbers
@@ -72,50 +196,40 @@ def _detect_and_split_winning_numbers(df):
             match_col = col_map[candidate]
             break
 
-    # If not found by candidate list, try to heuristically find a column that looks like numbers
+    # If not found by candidate list, heuristically find a column whose values look like "## ## ## ## ## ##"
     if match_col is None:
-        # look for a column whose values look like "## ## ## ## ## ##" pattern
-        for orig_col in df_copy.columns:
-            sample = df_copy[orig_col].dropna().astype(str).head(20).tolist()
-            # count how many rows look like they contain 6 numbers (space or comma separated)
-            looks_like = 0
-            for s in sample:
-                # remove extra parentheses or text
-                s_clean = s.strip()
-                # replace commas with spaces for checking
-                s2 = s_clean.replace(',', ' ')
-                parts = [p for p in s2.split() if p.strip()!='']
-                if len(parts) >= 6 and all(part.strip().lstrip('0').isdigit() for part in parts[:6]):
-                    looks_like += 1
-            if looks_like >= max(3, len(sample)//4):
+        for orig_col in df.columns:
+            # only a small sample is tested per column; the full split runs once, on the match
+            sample = df[orig_col].dropna().head(20)
+            looks_like = _extract_winning_numbers(sample).notna().all(axis=1).sum()
+            if looks_like >= max(3, len(sample) // 4):
                 match_col = orig_col
                 break
 
     if match_col is None:
         # give a helpful error listing available columns
-        raise ValueError(f"Could not find a column containing the winning numbers. Available columns: {list(df_copy.columns)}")
-
-    # Now we have a match_col: split it into 6 parts
-    # Normalize separators: commas or multiple spaces
-    s = df_copy[match_col].astype(str).str.replace(',', ' ', regex=False).str.replace(r'\s+', ' ', regex=True).str.strip()
-    parts = s.str.split(' ', expand=True)
-    if parts.shape[1] < 6:
-        # some datasets may combine last two numbers with a dash or other separator; try a looser split
-        parts = s.str.replace('-', ' ').str.split(' ', expand=True)
-    if parts.shape[1] < 6:
-        raise ValueError(f"Could not split '{match_col}' into 6 number columns. Sample values: {df_copy[match_col].astype(str).head(5).tolist()}")
-
-    # take first 6 columns as white1..white5 and powerball
-    parts = parts.iloc[:, :6].copy()
+        raise ValueError(f"Could not find a column containing the winning numbers. Available columns: {list(df.columns)}")
+
+    # Extract the 6 numbers in one vectorized pass; the extracted frame doubles as the split result
+    parts = _extract_winning_numbers(df[match_col])
+    matched = parts.notna().all(axis=1).to_numpy()
+    if not matched.any():
+        raise ValueError(f"Could not split '{match_col}' into 6 number columns. Sample values: {df[match_col].astype(str).head(5).tolist()}")
+
+    # drop rows that don't hold 6 numbers (blank/NaN cells), keeping df aligned with parts
+    if not matched.all():
+        parts = parts[matched]
+        df = df[matched]
+
+    # the 6 capture groups are white1..white5 and powerball
     parts.columns = ['white1','white2','white3','white4','white5','powerball']
-    # convert to int (strip leading zeros)
-    for col in parts.columns:
-        parts[col] = parts[col].astype(str).str.lstrip('0').replace('', '0')
-        parts[col] = parts[col].astype(int)
+    # convert to int in one pass (to_numeric handles leading zeros)
+    parts = parts.apply(pd.to_numeric)
 
-    # attach these standardized columns to df_copy (drop original match_col to avoid confusion)
-    df_copy = df_copy.reset_index(drop=True).copy()
-    df_copy[['white1','white2','white3','white4','white5','powerball']] = parts[['white1','white2','white3','white4','white5','powerball']]
+    # attach these standardized columns to a shallow copy of df (positionally, on a fresh 0..n-1 index)
+    df_copy = df.copy(deep=False)
+    df_copy.index = pd.RangeIndex(len(df_copy))
+    df_copy[DRAW_COLUMNS] = _narrow_balls(parts.to_numpy())
 
     return df_copy
 
@@ -131,64 +245,138 @@ def preprocess(df):
     except Exception as e:
         raise
 
-def analyze(df):
+# Where __main__ persists the compact draws array (see to_draws_array); reused while younger than CACHE_TTL
+DRAWS_CACHE_PATH = "draws_cache.npy"
+
+def to_draws_array(df):
     """
-    Run analysis on a preprocessed DataFrame (must have white1..white5 and powerball).
-    Returns:
-      - results: dict containing frequencies, hot/cold lists, chi-square outputs, weighted picks
-      - fig: matplotlib Figure containing the white-ball frequency bar chart
+    Pack a preprocessed DataFrame into one contiguous (n_draws, 6) array
+    (columns in DRAW_COLUMNS order; uint8 unless a value falls outside 0..255).
+    analyze() accepts this in place of the DataFrame.
     """
-    # Combine white numbers into a single Series
-    whites = pd.concat([df['white1'], df['white2'], df['white3'], df['white4'], df['white5']], ignore_index=True)
-    # Ensure values are in expected ranges
-    whites = whites.astype(int)
-    reds = df['powerball'].astype(int)
+    return np.ascontiguousarray(_narrow_balls(df[DRAW_COLUMNS].to_numpy()))
 
-    # Frequency counts
-    white_freq = whites.value_counts().reindex(range(1,70), fill_value=0).sort_index()
-    red_freq = reds.value_counts().reindex(range(1,27), fill_value=0).sort_index()
+def save_draws(df, path=DRAWS_CACHE_PATH):
+    """
+    Persist the draws of a preprocessed DataFrame as a .npy file (see to_draws_array).
+    Returns the saved array.
+    """
+    draws = to_draws_array(df)
+    np.save(path, draws)
+    return draws
 
-    # Prepare observed arrays
-    observed_white = white_freq.values.astype(float)
-    observed_red = red_freq.values.astype(float)
+def load_draws(path=DRAWS_CACHE_PATH, max_age=CACHE_TTL):
+    """
+    Load a draws array written by save_draws().
+    Returns None when the file is missing, unreadable or older than max_age seconds.
+    """
+    try:
+        if time.time() - os.path.getmtime(path) < max_age:
+            return np.load(path)
+    except Exception:
+        pass
+    return None
+
+def _ball_counts(values, n_balls):
+    """
+    Occurrences of each ball 1..n_balls in `values` (values outside that range are ignored).
+    Uses np.bincount on the common in-range case; falls back to np.unique so stray
+    out-of-range numbers can't blow up the bincount allocation.
+    """
+    if values.size == 0 or (values.min() >= 1 and values.max() <= n_balls):
+        return np.bincount(values, minlength=n_balls + 1)[1:]
+    uniq, cnt = np.unique(values, return_counts=True)
+    in_range = (uniq >= 1) & (uniq <= n_balls)
+    counts = np.zeros(n_balls, dtype=np.intp)
+    counts[uniq[in_range] - 1] = cnt[in_range]
+    return counts
+
+def _chisquare(observed, expected):
+    """
+    Pearson chi-square goodness-of-fit test with k - 1 degrees of freedom.
+    Same result as scipy.stats.chisquare, without its argument-validation overhead on these tiny arrays.
+    Returns (statistic, pvalue).
+    """
+    diff = observed - expected
+    stat = float((diff * diff / expected).sum())
+    # chi-square survival function: Q(dof/2, stat/2)
+    pvalue = float(gammaincc((observed.size - 1) / 2, stat / 2))
+    return stat, pvalue
+
+def _top_k_balls(keys, k):
+    """
+    Ball numbers (1-based) of the k smallest keys, smallest first.
+    argpartition selects them in O(n); only the k winners get sorted.
+    """
+    idx = np.argpartition(keys, k - 1)[:k]
+    idx = idx[np.argsort(keys[idx], kind='stable')]
+    return (idx + 1).tolist()  # +1 because indices start at 0
+
+def analyze(df):
+    """
+    Run analysis on a preprocessed DataFrame (must have white1..white5 and powerball)
+    or on a (n_draws, 6) draws array as built by to_draws_array().
+    Returns a results dict containing frequencies, hot/cold lists, chi-square outputs, weighted picks.
+    No figure is drawn here; pass the results to build_figure() for the bar chart.
+    """
+    # Combine white numbers into a single flat array. Read the columns in their own dtype
+    # (no copy for the uint8 columns preprocess produces) rather than forcing uint8, which
+    # would wrap out-of-range numbers into valid balls; _ball_counts does the range check.
+    if isinstance(df, np.ndarray):
+        whites_arr = df[:, :5].ravel()
+        reds_arr = df[:, 5]
+    else:
+        whites_arr = df[DRAW_COLUMNS[:5]].to_numpy().ravel()
+        reds_arr = df['powerball'].to_numpy()
+
+    # Frequency counts (balls are small bounded integers, so bincount replaces hashing)
+    observed_white = _ball_counts(whites_arr, 69).astype(float)
+    observed_red = _ball_counts(reds_arr, 26).astype(float)
+    white_freq = pd.Series(observed_white.astype(int), index=range(1,70))
+    red_freq = pd.Series(observed_red.astype(int), index=range(1,27))
 
     # Prepare expected arrays so sums match exactly observed sums
     expected_white = np.ones_like(observed_white) * (observed_white.sum() / observed_white.size)
     expected_red = np.ones_like(observed_red) * (observed_red.sum() / observed_red.size)
 
     # Run chi-square tests
-    chi_white_stat, chi_white_p = chisquare(f_obs=observed_white, f_exp=expected_white)
-    chi_red_stat, chi_red_p = chisquare(f_obs=observed_red, f_exp=expected_red)
+    chi_white_stat, chi_white_p = _chisquare(observed_white, expected_white)
+    chi_red_stat, chi_red_p = _chisquare(observed_red, expected_red)
 
     # Hot / Cold
-    hot_whites = list(np.argsort(-observed_white)[:5] + 1)  # +1 because indices start at 0
-    cold_whites = list(np.argsort(observed_white)[:5] + 1)
-    hot_reds = list(np.argsort(-observed_red)[:3] + 1)
-    cold_reds = list(np.argsort(observed_red)[:3] + 1)
+    hot_whites = _top_k_balls(-observed_white, 5)
+    cold_whites = _top_k_balls(observed_white, 5)
+    hot_reds = _top_k_balls(-observed_red, 3)
+    cold_reds = _top_k_balls(observed_red, 3)
 
     # Weighted picks (frequency-based weighting + 1 to avoid zero weight)
-    white_pool = list(range(1,70))
-    red_pool = list(range(1,27))
-    white_weights = (observed_white + 1).tolist()
-    red_weights = (observed_red + 1).tolist()
-
-    weighted_tickets = []
-    for _ in range(10):
-        pick = sorted(random.choices(white_pool, weights=white_weights, k=5))
-        pb = random.choices(red_pool, weights=red_weights, k=1)[0]
-        weighted_tickets.append({'whites': pick, 'powerball': int(pb)})
-
-    # Build bar chart figure
-    fig, ax = plt.subplots(figsize=(10,4))
-    ax.bar(range(1,70), observed_white)
-    ax.set_title("White Ball Frequencies (1-69)")
-    ax.set_xlabel("White Ball Number")
-    ax.set_ylabel("Occurrences")
-    plt.tight_layout()
+    rng = np.random.default_rng()
+    n_tickets = 10
+    white_weights = observed_white + 1
+    red_weights = observed_red + 1
+
+    # Gumbel-top-k: the 5 largest log(w) + Gumbel noise keys per row are a
+    # weighted sample without replacement, drawn for all tickets at once
+    keys = np.log(white_weights) + rng.gumbel(size=(n_tickets, 69))
+    picks = np.argpartition(-keys, 5, axis=1)[:, :5] + 1
+    picks.sort(axis=1)
+    # One powerball per ticket (with replacement): build the CDF once, then invert uniform draws
+    cdf_red = np.cumsum(red_weights)
+    cdf_red /= cdf_red[-1]
+    pbs = np.searchsorted(cdf_red, rng.random(n_tickets), side='right') + 1
+
+    weighted_tickets = [{'whites': pick.tolist(), 'powerball': int(pb)} for pick, pb in zip(picks, pbs)]
+
+    # powerball counts on the white-ball range 1..69: preallocate zeros and fill by ball number
+    red_counts = red_freq.to_numpy()
+    red_full = np.zeros(69, dtype=red_counts.dtype)
+    red_full[red_freq.index.to_numpy() - 1] = red_counts
 
     results = {
         'white_freq_series': white_freq,
         'red_freq_series': red_freq,
+        # powerball counts zero-padded onto the white-ball range 1..69, for side-by-side plots
+        'red_freq_padded': pd.Series(red_full, index=range(1,70)),
         'chi_square_white': {'statistic': float(chi_white_stat), 'pvalue': float(chi_white_p)},
         'chi_square_red': {'statistic': float(chi_red_stat), 'pvalue': float(chi_red_p)},
         'hot_whites': hot_whites,
@@ -198,21 +386,39 @@ def analyze(df):
         'weighted_tickets': weighted_tickets
     }
 
-    return results, fig
+    return results
+
+def build_figure(results):
+    """
+    Build the white-ball frequency bar chart from analyze() results.
+    Kept out of analyze() so the analysis hot path never touches Matplotlib.
+    """
+    white_freq = results['white_freq_series']
+    # OO API: the figure is never registered with pyplot, so nothing has to be closed
+    fig = Figure(figsize=(10,4))
+    ax = fig.subplots()
+    ax.bar(white_freq.index, white_freq.values)
+    ax.set_title("White Ball Frequencies (1-69)")
+    ax.set_xlabel("White Ball Number")
+    ax.set_ylabel("Occurrences")
+    fig.tight_layout()
+    return fig
 
 def generate_weighted_picks_from_df(df, n=5):
     """
     Convenience wrapper: preprocess (if needed) then analyze and return just picks.
     """
     df2 = preprocess(df)
-    results, fig = analyze(df2)
+    results = analyze(df2)
     return results['weighted_tickets']
 
 if __name__ == "__main__":
     # quick local test: fetch and run analysis, print summary
-    df_raw = fetch_powerball_data()
-    df = preprocess(df_raw)
-    results, fig = analyze(df)
+    # a fresh draws array on disk skips the fetch and preprocess entirely
+    draws = load_draws()
+    if draws is None:
+        draws = save_draws(preprocess(fetch_powerball_data()))
+    results = analyze(draws)
     print("Chi-square (white):", results['chi_square_white'])
     print("Chi-square (red):", results['chi_square_red'])
     print("Hot whites:", results['hot_whites'])
@@ -221,4 +427,5 @@ if __name__ == "__main__":
     for t in results['weighted_tickets'][:5]:
         print(t)
     # save figure to file for quick local check
+    fig = build_figure(results)
     fig.savefig("white_freq_preview.png")
@@ -1,11 +1,23 @@
 # streamlit_app.py (complete file)
 import streamlit as st
-import matplotlib.pyplot as plt
-import seaborn as sns
-import pandas as pd
 import numpy as np
 import datetime
-import powerball_auto_analysis as pba
+import io
+import time
+# Matplotlib, pandas and powerball_auto_analysis are imported lazily, inside the
+# functions and the button branch that use them, so the first page paint doesn't
+# wait on them (after the first import, each import is a sys.modules lookup).
+
+# Next Powerball draw day (draws are Monday, Wednesday, Saturday) for each weekday
+_NEXT_DRAW = {
+    "Monday": "Wednesday",
+    "Tuesday": "Wednesday",
+    "Wednesday": "Saturday",
+    "Thursday": "Saturday",
+    "Friday": "Saturday",
+    "Saturday": "Monday",
+    "Sunday": "Monday",
+}
 
 # -------------------- APP CONFIG --------------------
 st.set_page_config(
@@ -15,6 +27,118 @@ st.set_page_config(
     initial_sidebar_state="expanded",
 )
 
+# -------------------- CACHED ANALYSIS --------------------
+# Identical inputs short-circuit to the stored results, so repeat clicks skip the work.
+# Each refetch (and each day's one-year window) is a new key, so the per-dataset caches
+# keep only the latest few entries instead of growing for the life of the server.
+CACHE_MAX_ENTRIES = 2
+
+# Persisted to disk so restarts skip the download. This is the app's only disk copy (the
+# module's parquet cache is bypassed). Streamlit ignores ttl for persisted caches, so the
+# single entry carries its fetch time and is replaced (pickle included) once it is older
+# than FETCH_TTL and a refetch succeeds.
+FETCH_TTL = 21600
+
+@st.cache_data(persist="disk", show_spinner="Fetching Powerball data…")
+def cached_fetch(_df_raw=None):
+    """
+    (fetch time, raw dataset). Passing _df_raw stores an already fetched dataset
+    under the same single key (underscore arguments aren't hashed).
+    """
+    import powerball_auto_analysis as pba
+    if _df_raw is None:
+        _df_raw = pba.fetch_powerball_data(cache_path=None)
+    return time.time(), _df_raw
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)  # DataFrame args are keyed by Streamlit's hash_pandas_object-based hasher
+def cached_preprocess(df_raw):
+    import powerball_auto_analysis as pba
+    return pba.preprocess(df_raw)
+
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def cached_analyze(draws):
+    """analyze() results plus the weighted-pick sampling arrays, normalized once per dataset."""
+    import powerball_auto_analysis as pba
+    results = pba.analyze(draws)
+    white_weights = results["white_freq_series"].to_numpy(np.float64)
+    power_weights = results["red_freq_series"].to_numpy(np.float64)
+    # Safety: if any sum is zero, replace with uniform weights
+    if white_weights.sum() <= 0:
+        white_weights = np.ones_like(white_weights)
+    if power_weights.sum() <= 0:
+        power_weights = np.ones_like(power_weights)
+    # Normalized, contiguous float64 probabilities for the samplers
+    results["white_p"] = white_weights / white_weights.sum()
+    results["power_p"] = power_weights / power_weights.sum()
+    results["white_numbers"] = results["white_freq_series"].index.to_numpy(np.int64)
+    results["power_numbers"] = results["red_freq_series"].index.to_numpy(np.int64)
+    return results
+
+# -------------------- CACHED FIGURES --------------------
+# Figures are rendered once per dataset with the OO API (no pyplot global state) and cached
+# as PNG bytes: Matplotlib figures aren't thread-safe, so a live Figure can't be shared by sessions.
+# Keys are the raw bytes of int64 count arrays, which hash cheaply.
+@st.cache_data(show_spinner=False, max_entries=CACHE_MAX_ENTRIES)
+def heatmap_png(white_vals: bytes, red_vals: bytes) -> bytes:
+    """2 x 69 heat grid (white balls, zero-padded powerballs) drawn as a single PNG image."""
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+    mat = np.vstack([np.frombuffer(white_vals, dtype=np.int64), np.frombuffer(red_vals, dtype=np.int64)])
+    heat_fig = Figure(figsize=(12, 3))
+    FigureCanvasAgg(heat_fig)
+    ax = heat_fig.subplots()
+    im = ax.imshow(mat, cmap="coolwarm", aspect="auto", extent=(0.5, 69.5, 1.5, -0.5))
+    ax.set_yticks([0, 1], ["White Balls", "Powerballs"])
+    ax.set_xlabel("Ball Number")
+    heat_fig.colorbar(im, ax=ax)
+    ax.set_title("Heatmap of White Balls (top) and Powerballs (bottom)")
+    heat_fig.tight_layout()
+    # same output settings st.pyplot uses
+    buf = io.BytesIO()
+    heat_fig.savefig(buf, format="png", dpi=200, bbox_inches="tight")
+    return buf.getvalue()
+
+# -------------------- WEIGHTED PICKS --------------------
+@st.fragment
+def render_picks(white_numbers, white_p, power_numbers, power_p, draw_days, next_draw):
+    """
+    Weighted picks for each draw day. Runs as a fragment, so "Regenerate picks"
+    reruns only this block instead of the whole analysis page.
+    """
+    st.button("🔁 Regenerate picks")
+
+    rng = np.random.default_rng()  # use new Generator for better randomness
+    # log-weights for Gumbel-top-k sampling; zero-weight numbers get -inf and are never picked
+    with np.errstate(divide="ignore"):
+        white_logw = np.log(white_p)
+
+    # Draw all picks (5 per draw day) at once: the 5 largest log-weight + Gumbel noise
+    # keys in each row are a weighted sample of 5 unique white numbers
+    n_picks = len(draw_days) * 5
+    keys = white_logw + rng.gumbel(size=(n_picks, white_logw.size))
+    top5 = np.argpartition(keys, -5, axis=1)[:, -5:]
+    whites_all = np.sort(white_numbers[top5], axis=1)
+    powers_all = rng.choice(power_numbers, size=n_picks, p=power_p)
+
+    for day_i, day in enumerate(draw_days):
+        # Build the whole day (header, 5 picks, divider) as one Markdown block: one message to the browser per day
+        if day == next_draw:
+            lines = [f"### 🗓 <span style='color:limegreen'>**{day} Draw Picks (NEXT DRAW)**</span>"]
+        else:
+            lines = [f"### 🗓 {day} Draw Picks"]
+
+        # 5 unique picks for this draw day
+        for i in range(5):
+            whites = whites_all[day_i * 5 + i].tolist()
+            powerball = int(powers_all[day_i * 5 + i])
+            lines.append(f"**Pick {i+1}:** 🎱 Whites → {whites} | 🔴 Powerball → {powerball}")
+
+        lines.append("---")
+        st.markdown("\n\n".join(lines), unsafe_allow_html=day == next_draw)
+
+    # Timestamp
+    st.caption(f"🕓 Picks generated on **{datetime.date.today().strftime('%A, %B %d, %Y')}** at **{datetime.datetime.now().strftime('%I:%M %p')}**")
+
 # -------------------- SIDEBAR --------------------
 st.sidebar.image("https://upload.wikimedia.org/wikipedia/commons/9/99/Powerball_logo.svg", width=150)
 st.sidebar.title("🎯 Powerball Analyzer")
@@ -31,18 +155,36 @@ st.markdown("Welcome! Click the button below to fetch real Powerball results and
 # Button to run analysis
 if st.button("🚀 Fetch & Analyze Data"):
     with st.spinner("Fetching and analyzing Powerball data... ⏳"):
+        # Heavy imports are paid only once analysis is requested (Python caches them after the first click)
+        import pandas as pd
+        import powerball_auto_analysis as pba
+
         try:
             # Fetch + preprocess + analyze
-            df_raw = pba.fetch_powerball_data()
+            fetched_at, df_raw = cached_fetch()
+            if time.time() - fetched_at > FETCH_TTL:
+                # refetch before dropping the stale entry, so a failed download keeps serving it
+                try:
+                    df_fresh = pba.fetch_powerball_data(cache_path=None)
+                except RuntimeError as e:
+                    st.warning(f"⚠️ Could not refresh the Powerball data, using the copy fetched {datetime.datetime.fromtimestamp(fetched_at):%b %d, %Y %I:%M %p}. ({e})")
+                else:
+                    cached_fetch.clear()
+                    fetched_at, df_raw = cached_fetch(df_fresh)
             
-            df = pba.preprocess(df_raw)
+            df = cached_preprocess(df_raw)
             # 🔄 Filter data for only the last 1 year
             one_year_ago = datetime.date.today() - datetime.timedelta(days=365)
             if "date" in df.columns:
                 df = df[df["date"] >= pd.Timestamp(one_year_ago)]
             st.info(f"📅 Using Powerball draws from the last 1 year — {len(df)} records included.")
 
-            results, fig = pba.analyze(df)
+            # analyze only needs the 6 ball columns, packed as one compact uint8 array
+            draws = pba.to_draws_array(df)
+            results = cached_analyze(draws)
+            # Materialize the count arrays once; the sections below share them
+            white_vals = results["white_freq_series"].to_numpy(np.int64)
+            red_full = results["red_freq_padded"].to_numpy(np.int64)  # powerball counts aligned to balls 1..69
 
             st.success("✅ Analysis complete!")
 
@@ -58,49 +200,38 @@ if st.button("🚀 Fetch & Analyze Data"):
 
             # ---------- COMBINED FREQUENCY VISUAL ----------
             st.subheader("🎨 Combined Frequency Visualization")
-            freq_fig, ax = plt.subplots(figsize=(10, 4))
-            ax.bar(results["white_freq_series"].index, results["white_freq_series"].values, label="White Balls", alpha=0.7)
-            # scale powerballs to white ball max for visual comparison
-            red_vals = results["red_freq_series"].reindex(range(1, 70), fill_value=0).values
-            if red_vals.max() > 0:
-                scaled_red = red_vals / red_vals.max() * results["white_freq_series"].values.max()
-            else:
-                scaled_red = red_vals
-            ax.bar(range(1, 70), scaled_red, label="Powerballs (scaled)", alpha=0.6, color="red")
-            ax.legend()
-            ax.set_title("White Balls vs Powerballs Frequency Comparison (Powerballs scaled)")
-            ax.set_xlabel("Ball Number")
-            ax.set_ylabel("Frequency (scaled)")
-            st.pyplot(freq_fig)
-            plt.close(freq_fig)
+            # scale powerballs to white ball max for visual comparison (one scalar, one C reduction per array)
+            red_max = red_full.max()
+            scale = white_vals.max() / red_max if red_max > 0 else 1
+            # Vega-Lite renders the bars in the browser; no server-side Matplotlib figure
+            st.bar_chart(
+                pd.DataFrame(
+                    {"White Balls": white_vals, "Powerballs (scaled)": red_full * scale},
+                    index=pd.RangeIndex(1, 70, name="Ball Number"),
+                ),
+                stack=False,
+                color=["#1f77b4", "#d62728"],
+                y_label="Frequency (scaled)",
+            )
 
             # ---------- TREND OVER TIME ----------
             st.subheader("📈 Frequency Trend Over Time")
-            # Build trend (simple frequency line of white numbers)
-            white_numbers = df[['white1', 'white2', 'white3', 'white4', 'white5']].melt(value_name='number')
-            white_trend = white_numbers['number'].value_counts().sort_index().reset_index()
-            white_trend.columns = ['Ball', 'Frequency']
-
-            trend_fig, ax = plt.subplots(figsize=(10, 4))
-            sns.lineplot(data=white_trend, x='Ball', y='Frequency', marker='o', ax=ax)
-            ax.set_title("Trend of White Ball Frequencies (by number)")
-            ax.set_xlabel("White Ball Number (1–69)")
-            ax.set_ylabel("Occurrences")
-            st.pyplot(trend_fig)
-            plt.close(trend_fig)
+            # Build trend (simple frequency line of white numbers) straight from analyze's bincount array
+            white_trend = pd.DataFrame(
+                {'Frequency': white_vals},
+                index=pd.RangeIndex(1, 70, name='Ball'),
+            )
+            # Rendered client-side by Vega-Lite, no Matplotlib figure needed
+            st.line_chart(white_trend, x_label="White Ball Number (1–69)", y_label="Occurrences")
 
             # ---------- HEATMAP ----------
             st.subheader("🔥 Hot vs Cold Heatmap")
-            heat_data = pd.DataFrame({
-                "White Balls": results["white_freq_series"],
-                "Powerballs": results["red_freq_series"].reindex(range(1, 70), fill_value=0)
-            })
-            # Transpose so rows = categories, cols = numbers
-            heat_fig, ax = plt.subplots(figsize=(12, 3))
-            sns.heatmap(heat_data.T, cmap="coolwarm", cbar=True, ax=ax)
-            ax.set_title("Heatmap of White Balls (left) and Powerballs (right)")
-            st.pyplot(heat_fig)
-            plt.close(heat_fig)
+            # rows = categories, cols = numbers
+            heat_png = heatmap_png(
+                white_vals.tobytes(),
+                red_full.tobytes(),
+            )
+            st.image(heat_png, width="stretch")
 
             # ---------- RANDOMNESS TEST ----------
             st.subheader("🎲 Randomness Check")
@@ -130,79 +261,15 @@ if st.button("🚀 Fetch & Analyze Data"):
 
             # Define draw days & compute next draw
             draw_days = ["Monday", "Wednesday", "Saturday"]
-            today = datetime.date.today()
-            today_name = today.strftime("%A")
-
-            def next_draw_day(today_name):
-                days_order = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-                idx_today = days_order.index(today_name)
-                for offset in range(1, 8):
-                    next_day = days_order[(idx_today + offset) % 7]
-                    if next_day in draw_days:
-                        return next_day
-                return "Monday"
-
-            next_draw = next_draw_day(today_name)
-
-            # Prepare probability arrays
-            white_numbers_idx = results["white_freq_series"].index.to_numpy()
-            white_weights = results["white_freq_series"].values.astype(float)
-            power_numbers_idx = results["red_freq_series"].index.to_numpy()
-            power_weights = results["red_freq_series"].values.astype(float)
-
-            # Safety: if any sum is zero, replace with uniform weights
-            if white_weights.sum() <= 0:
-                white_weights = np.ones_like(white_weights)
-            if power_weights.sum() <= 0:
-                power_weights = np.ones_like(power_weights)
-
-            # Normalize for np.random.choice 'p' argument
-            white_p = white_weights / white_weights.sum()
-            power_p = power_weights / power_weights.sum()
-
-            rng = np.random.default_rng()  # use new Generator for better randomness
-
-            for day in draw_days:
-                if day == next_draw:
-                    st.markdown(f"### 🗓 <span style='color:limegreen'>**{day} Draw Picks (NEXT DRAW)**</span>", unsafe_allow_html=True)
-                else:
-                    st.markdown(f"### 🗓 {day} Draw Picks")
-
-                # Generate 5 unique picks for this draw day
-                picks_for_day = []
-                for i in range(5):
-                    # sample 5 unique white numbers using weighted probabilities
-                    whites = []
-                    # draw iteratively without replacement using weights:
-                    available_numbers = white_numbers_idx.copy()
-                    available_probs = white_p.copy()
-                    # Select 5 numbers without replacement
-                    selected = []
-                    for _ in range(5):
-                        choice = rng.choice(available_numbers, p=available_probs / available_probs.sum())
-                        selected.append(int(choice))
-                        # remove choice
-                        mask = available_numbers != choice
-                        available_numbers = available_numbers[mask]
-                        available_probs = available_probs[mask]
-                        if available_probs.size == 0:
-                            break
-                    whites = sorted(selected)
-
-                    # powerball pick (one number)
-                    powerball = int(rng.choice(power_numbers_idx, p=power_p))
-                    picks_for_day.append({'whites': whites, 'powerball': powerball})
-                    st.markdown(f"**Pick {i+1}:** 🎱 Whites → {whites} | 🔴 Powerball → {powerball}")
-
-                st.markdown("---")
-
-            # Timestamp
-            st.caption(f"🕓 Picks generated on **{today.strftime('%A, %B %d, %Y')}** at **{datetime.datetime.now().strftime('%I:%M %p')}**")
+            today_name = datetime.date.today().strftime("%A")
+            next_draw = _NEXT_DRAW[today_name]
+
+            render_picks(results["white_numbers"], results["white_p"], results["power_numbers"], results["power_p"], draw_days, next_draw)
 
             # ---------- VISUAL RECAP ----------
             st.subheader("Visual Recap")
-            st.pyplot(fig)
-            plt.close(fig)
+            fig = pba.build_figure(results)
+            st.pyplot(fig, clear_figure=True)
 
         except Exception as e:
             st.error(f"⚠️ Error during analysis: {e}")